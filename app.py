@@ -13,24 +13,58 @@ def extract_text_from_docx(file_path):
         return ""
 import os
 import json
+import time
 import pdfplumber
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 from werkzeug.utils import secure_filename
-from database import db, Job, Candidate, AnalysisResult
-from services.gemini_service import get_gemini_analysis
+from database import db, Job, Candidate, AnalysisResult, create_tables
+from services.gemini_service import get_gemini_analysis, get_routed_analysis, stream_gemini_analysis, configure_client, quota_available
+from services.local_scorer import LOCAL_SOURCE, score_resume, score_resumes
+from services.dedup_service import compute_fingerprint, find_duplicate, save_fingerprint
+from services.export_service import EXPORT_FORMATS, iter_result_rows, parquet_available
+from services.read_service import json_response, get_job_results, get_shortlisted, get_dashboard_summary
 
 # --- App Configuration ---
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///resumematch.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///resumematch.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+    # Let concurrent worker processes wait for SQLite's write lock instead of failing
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
 app.config['UPLOAD_FOLDER'] = 'uploads'
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Duplicate resume detection: max SimHash bit distance for a near duplicate,
+# and whether a duplicate may reuse the analysis of the resume it matches
+app.config['DEDUP_MAX_DISTANCE'] = int(os.getenv('DEDUP_MAX_DISTANCE', '7'))
+app.config['DEDUP_REUSE_ANALYSIS'] = os.getenv('DEDUP_REUSE_ANALYSIS', 'true').lower() == 'true'
+# Re-scoring of locally scored results with Gemini: how many to take after an upload that
+# hit no quota error, the most one /api/rescore call may take, the seconds either may spend
+# before stopping (kept well below the gunicorn timeout), the attempts before a failing
+# result is given up on, and the seconds after which a claim by a worker that never
+# finished (e.g. one killed mid-call) expires
+app.config['RESCORE_BATCH_SIZE'] = int(os.getenv('RESCORE_BATCH_SIZE', '5'))
+app.config['RESCORE_MAX_LIMIT'] = int(os.getenv('RESCORE_MAX_LIMIT', '20'))
+app.config['RESCORE_UPLOAD_TIME_BUDGET'] = float(os.getenv('RESCORE_UPLOAD_TIME_BUDGET', '10'))
+app.config['RESCORE_TIME_BUDGET'] = float(os.getenv('RESCORE_TIME_BUDGET', '120'))
+app.config['RESCORE_MAX_ATTEMPTS'] = int(os.getenv('RESCORE_MAX_ATTEMPTS', '3'))
+app.config['RESCORE_CLAIM_TIMEOUT'] = float(os.getenv('RESCORE_CLAIM_TIMEOUT', '600'))
 
 db.init_app(app)
 
 # Initialize Flask-Mail
 mail = init_mail(app)
 
+def init_worker():
+    """
+    Resets process-local resources in a freshly forked worker.
+    The app is preloaded in the master, so database connections and the Gemini
+    client inherited from it must not be reused by the workers. Flask-Mail
+    opens a fresh SMTP connection per send, so it needs no reset.
+    """
+    with app.app_context():
+        db.engine.dispose(close=False)
+    configure_client()
+
 # --- Helper Function ---
 def extract_text_from_pdf(file_path):
     """Extracts text from a PDF file."""
@@ -41,6 +75,121 @@ def extract_text_from_pdf(file_path):
         print(f"Error extracting text from {file_path}: {e}")
         return ""
 
+def apply_analysis_data(result, analysis_data):
+    """Copies an analysis dictionary onto an AnalysisResult row."""
+    result.score = analysis_data.get('relevance_score')
+    result.verdict = analysis_data.get('fit_verdict')
+    result.summary = analysis_data.get('summary')
+    result.feedback = analysis_data.get('personalized_feedback')
+    result.missing_skills = json.dumps(analysis_data.get('missing_skills', [])) # Store list as JSON string
+    result.tier = analysis_data.get('tier')
+    result.source = analysis_data.get('source', 'gemini')
+
+def save_analysis_result(candidate_id, analysis_data):
+    """Stores an analysis dictionary as the candidate's AnalysisResult."""
+    result = AnalysisResult(candidate_id=candidate_id)
+    apply_analysis_data(result, analysis_data)
+    db.session.add(result)
+    db.session.commit()
+    return result
+
+def copy_analysis_result(analysis, candidate_id):
+    """Reuses an existing AnalysisResult for another candidate without calling the AI again."""
+    result = AnalysisResult(
+        score=analysis.score,
+        verdict=analysis.verdict,
+        summary=analysis.summary,
+        feedback=analysis.feedback,
+        missing_skills=analysis.missing_skills,
+        tier=analysis.tier,
+        source=analysis.source,
+        candidate_id=candidate_id
+    )
+    db.session.add(result)
+    db.session.commit()
+    return result
+
+def unclaimed_for_rescore():
+    """Filter for results no worker is currently re-scoring."""
+    expired = time.time() - app.config['RESCORE_CLAIM_TIMEOUT']
+    return db.or_(AnalysisResult.rescore_claimed_at.is_(None), AnalysisResult.rescore_claimed_at < expired)
+
+def pending_rescore_query():
+    """Local results still eligible for AI re-scoring, least-tried first."""
+    attempts = db.func.coalesce(AnalysisResult.rescore_attempts, 0)
+    return AnalysisResult.query.filter(
+        AnalysisResult.source == LOCAL_SOURCE,
+        attempts < app.config['RESCORE_MAX_ATTEMPTS'],
+        unclaimed_for_rescore()
+    ).order_by(attempts, AnalysisResult.id)
+
+def claim_for_rescore(result):
+    """
+    Claims a queued local result for re-scoring and counts the attempt, in
+    one conditional UPDATE so concurrent workers never re-score the same result.
+
+    Returns:
+        False if another worker claimed or re-scored it first.
+    """
+    seen = result.rescore_attempts or 0
+    claimed = db.session.execute(
+        db.update(AnalysisResult).where(
+            AnalysisResult.id == result.id,
+            AnalysisResult.source == LOCAL_SOURCE,
+            db.func.coalesce(AnalysisResult.rescore_attempts, 0) == seen,
+            unclaimed_for_rescore()
+        ).values(rescore_attempts=seen + 1, rescore_claimed_at=time.time()),
+        execution_options={'synchronize_session': False}
+    ).rowcount == 1
+    db.session.commit()
+    return claimed
+
+def rescore_fallback_results(limit, time_budget):
+    """
+    Re-scores up to limit results produced by the local scorer with Gemini,
+    starting no new result once time_budget seconds have passed. Stops at
+    the first quota error; the remaining results stay queued. A result that
+    fails for another reason counts an attempt and moves to the back of the
+    queue, and one whose resume file cannot be read is given up on at once,
+    so failing results cannot block the queue. Each result is claimed before
+    the model is called, so concurrent workers skip it.
+
+    Returns:
+        The number of results re-scored.
+    """
+    started = time.monotonic()
+    rescored = 0
+    for result in pending_rescore_query().limit(limit).all():
+        if not quota_available() or time.monotonic() - started >= time_budget:
+            break
+        seen = result.rescore_attempts or 0
+        if not claim_for_rescore(result):
+            continue
+        result.rescore_claimed_at = None
+        candidate = result.candidate
+        resume_text = extract_text_from_pdf(os.path.join(app.config['UPLOAD_FOLDER'], candidate.resume_filename))
+        if not resume_text:
+            print(f"Cannot re-score {candidate.name}: resume file missing or unreadable")
+            result.rescore_attempts = app.config['RESCORE_MAX_ATTEMPTS']
+            db.session.commit()
+            continue
+        analysis_data = get_routed_analysis(candidate.job.description, resume_text, threshold=65)
+        if "error" in analysis_data:
+            if analysis_data.get('quota_exceeded'):
+                # Throttling is not the result's fault; release it without counting the attempt
+                result.rescore_attempts = seen
+                db.session.commit()
+                break
+            # The claim already counted the attempt
+            db.session.commit()
+            continue
+        apply_analysis_data(result, analysis_data)
+        result.rescore_attempts = None
+        db.session.commit()
+        rescored += 1
+        print(f"Re-scored {candidate.name}: Score {result.score}, Tier {result.tier}")
+    return rescored
+
 # --- HTML Page Routes ---
 @app.route('/')
 def index():
@@ -49,48 +198,10 @@ def index():
 @app.route('/dashboard')
 def dashboard():
     try:
-        # --- 1. Query the database for key statistics ---
-        total_jobs = Job.query.count()
-        total_apps_processed = Candidate.query.count()
-
-        # --- 2. Get all jobs and calculate summary data for each ---
-        jobs = Job.query.order_by(Job.id.desc()).all()
-        jobs_summary = []
-        for job in jobs:
-            try:
-                shortlisted_count = 0
-                rejected_count = 0
-                total_applicants = len(job.candidates)
-                scores = []
-                for candidate in job.candidates:
-                    try:
-                        if candidate.analysis:
-                            verdict = candidate.analysis.verdict.lower()
-                            score = candidate.analysis.score
-                            if isinstance(score, int):
-                                scores.append(score)
-                                # Use 65% threshold for shortlisting
-                                if score >= 65:
-                                    shortlisted_count += 1
-                                else:
-                                    rejected_count += 1
-                    except Exception as e:
-                        print(f"Error processing candidate {candidate.id}: {e}")
-                        continue
-                avg_score = round(sum(scores)/len(scores), 1) if scores else 0
-                jobs_summary.append({
-                    'id': job.id,
-                    'title': job.title,
-                    'shortlisted_count': shortlisted_count,
-                    'rejected_count': rejected_count,
-                    'total_applicants': total_applicants,
-                    'avg_score': avg_score
-                })
-            except Exception as e:
-                print(f"Error processing job {job.id}: {e}")
-                continue
+        # --- 1. Aggregate per-job statistics in a single query (65% shortlisting threshold) ---
+        total_jobs, total_apps_processed, jobs_summary = get_dashboard_summary(65)
 
-        # --- 3. Pass all the data to the template ---
+        # --- 2. Pass all the data to the template ---
         return render_template(
             'dasbord.html',
             total_jobs=total_jobs,
@@ -126,6 +237,8 @@ def letters_page():
         
         # Get AI Analysis for cover letter
         analysis_data = get_gemini_analysis(job_description, resume_text)
+        if analysis_data.get('quota_exceeded'):
+            analysis_data = score_resume(job_description, resume_text)
         
         if "error" not in analysis_data:
             return render_template('letter.html', result=analysis_data)
@@ -134,6 +247,26 @@ def letters_page():
     
     return render_template('letter.html')
 
+@app.route('/letters/stream', methods=['POST'])
+def letters_stream():
+    """Streams the cover letter analysis as newline-delimited JSON events."""
+    job_description = request.form.get('job_description')
+    resume_text = request.form.get('resume_text')
+
+    if not job_description or not resume_text:
+        return jsonify({'error': 'Both job description and resume text are required.'}), 400
+
+    def generate():
+        for event in stream_gemini_analysis(job_description, resume_text):
+            yield json.dumps(event) + "\n"
+
+    # Disable proxy buffering so each event reaches the browser as soon as it is yielded
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'}
+    )
+
 # --- API Endpoints ---
 
 # API to manage Jobs
@@ -210,6 +343,10 @@ def upload_resumes():
     uploaded_files = request.files.getlist('resumes')
     processed_count = 0
     total_files = len([f for f in uploaded_files if f.filename != ''])
+    duplicates = []
+    fallback = [] # (candidate_id, resume_text) pairs to score locally when the quota is exhausted
+    max_distance = app.config['DEDUP_MAX_DISTANCE']
+    reuse_analysis = app.config['DEDUP_REUSE_ANALYSIS']
     
     for file in uploaded_files:
         if file.filename == '':
@@ -227,30 +364,70 @@ def upload_resumes():
                 print(f"Warning: Could not extract text from {filename}")
                 continue # Skip if PDF is empty or unreadable
 
+            # Check for a duplicate of this resume, first within the job, then across all jobs
+            fingerprint = compute_fingerprint(resume_text)
+            duplicate = find_duplicate(fingerprint, job_id=job.id, max_distance=max_distance)
+            if duplicate and (duplicate['match'] == 'exact' or reuse_analysis):
+                # Same resume already uploaded for this job: link to the existing candidate
+                original = db.session.get(Candidate, duplicate['fingerprint'].candidate_id)
+                print(f"Duplicate resume {filename} ({duplicate['match']} match) linked to candidate {original.id}")
+                if not original.analysis:
+                    analysis_data = get_routed_analysis(job.description, resume_text, threshold=65)
+                    if "error" not in analysis_data:
+                        save_analysis_result(original.id, analysis_data)
+                    elif analysis_data.get('quota_exceeded'):
+                        fallback.append((original.id, resume_text))
+                duplicates.append({
+                    'filename': filename,
+                    'duplicate_of': original.id,
+                    'match': duplicate['match'],
+                    'distance': duplicate['distance']
+                })
+                processed_count += 1
+                continue
+            if not duplicate:
+                duplicate = find_duplicate(fingerprint, max_distance=max_distance)
+            duplicate_of_id = None
+            if duplicate:
+                matched = duplicate['fingerprint']
+                duplicate_of_id = matched.duplicate_of_id or matched.candidate_id
+
             # Create Candidate record
             candidate_name = os.path.splitext(filename)[0].replace('_', ' ').replace('-', ' ').title()
             candidate = Candidate(name=candidate_name, resume_filename=filename, job_id=job.id)
             db.session.add(candidate)
+            db.session.flush()
+            save_fingerprint(fingerprint, candidate.id, job.id, duplicate_of_id=duplicate_of_id)
             db.session.commit()
             print(f"Created candidate record for: {candidate_name}")
 
+            if duplicate_of_id:
+                duplicates.append({
+                    'filename': filename,
+                    'duplicate_of': duplicate_of_id,
+                    'match': duplicate['match'],
+                    'distance': duplicate['distance']
+                })
+                # A job posted twice with the same description gets the same analysis
+                original = db.session.get(Candidate, duplicate['fingerprint'].candidate_id)
+                if (reuse_analysis and duplicate['match'] == 'exact' and original.analysis
+                        and original.job.description == job.description):
+                    copy_analysis_result(original.analysis, candidate.id)
+                    print(f"Reused analysis of candidate {original.id} for: {candidate_name}")
+                    processed_count += 1
+                    continue
+
             # Get AI Analysis
             print(f"Starting analysis for: {candidate_name}")
-            analysis_data = get_gemini_analysis(job.description, resume_text)
+            analysis_data = get_routed_analysis(job.description, resume_text, threshold=65)
             
             if "error" not in analysis_data:
                 # Save analysis result to database
-                result = AnalysisResult(
-                    score=analysis_data.get('relevance_score'),
-                    verdict=analysis_data.get('fit_verdict'),
-                    summary=analysis_data.get('summary'),
-                    feedback=analysis_data.get('personalized_feedback'),
-                    missing_skills=json.dumps(analysis_data.get('missing_skills', [])), # Store list as JSON string
-                    candidate_id=candidate.id
-                )
-                db.session.add(result)
-                db.session.commit()
-                print(f"Analysis completed for {candidate_name}: Score {analysis_data.get('relevance_score')}, Verdict {analysis_data.get('fit_verdict')}")
+                save_analysis_result(candidate.id, analysis_data)
+                print(f"Analysis completed for {candidate_name}: Score {analysis_data.get('relevance_score')}, Verdict {analysis_data.get('fit_verdict')}, Tier {analysis_data.get('tier')}")
+            elif analysis_data.get('quota_exceeded'):
+                print(f"API quota exceeded, {candidate_name} will be scored locally")
+                fallback.append((candidate.id, resume_text))
             else:
                 print(f"Analysis failed for {candidate_name}: {analysis_data.get('error')}")
                 
@@ -261,10 +438,26 @@ def upload_resumes():
             print(f"Error processing candidate {filename}: {e}")
             continue
 
+    if fallback:
+        # Score every throttled resume of the batch against the job description in one pass
+        local_results = score_resumes(job.description, [resume_text for _, resume_text in fallback])
+        for (candidate_id, _), analysis_data in zip(fallback, local_results):
+            try:
+                save_analysis_result(candidate_id, analysis_data)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error saving local score for candidate {candidate_id}: {e}")
+    elif processed_count:
+        # Quota is available again: work through earlier locally scored results
+        rescore_fallback_results(app.config['RESCORE_BATCH_SIZE'], app.config['RESCORE_UPLOAD_TIME_BUDGET'])
+
     return jsonify({
         "message": f"Resumes uploaded and analysis completed. Processed {processed_count} out of {total_files} files.",
         "processed_count": processed_count,
         "total_files": total_files,
+        "fallback_count": len(fallback),
+        "duplicate_count": len(duplicates),
+        "duplicates": duplicates,
         "success": True
     }), 202
 
@@ -275,8 +468,7 @@ def get_results(job_id):
     if not job:
         return jsonify({"error": "Job not found"}), 404
         
-    candidates = Candidate.query.filter_by(job_id=job_id).order_by(Candidate.id.desc()).all()
-    return jsonify([c.to_dict() for c in candidates])
+    return json_response(get_job_results(job_id))
 
 # API to get all shortlisted candidates across all jobs
 @app.route('/api/shortlisted', methods=['GET'])
@@ -284,34 +476,58 @@ def get_shortlisted_candidates():
     """Get all shortlisted candidates with their job details."""
     try:
         # Query for candidates with score >= 65% (shortlisting threshold)
-        candidates = db.session.query(Candidate, Job, AnalysisResult).join(
-            AnalysisResult, Candidate.id == AnalysisResult.candidate_id
-        ).join(
-            Job, Candidate.job_id == Job.id
-        ).filter(
-            AnalysisResult.score >= 65
-        ).order_by(AnalysisResult.score.desc()).all()
+        shortlisted_data = get_shortlisted(65)
         
-        shortlisted_data = []
-        for candidate, job, analysis in candidates:
-            shortlisted_data.append({
-                'id': candidate.id,
-                'name': candidate.name,
-                'email': candidate.email or '',
-                'resume_filename': candidate.resume_filename,
-                'job_title': job.title,
-                'company': job.company,
-                'job_id': job.id,
-                'score': analysis.score,
-                'verdict': analysis.verdict,
-                'summary': analysis.summary
-            })
-        
-        return jsonify(shortlisted_data), 200
+        return json_response(shortlisted_data, 200)
         
     except Exception as e:
         return jsonify({"error": f"Failed to fetch shortlisted candidates: {str(e)}"}), 500
 
+# API to re-score locally scored results with Gemini
+@app.route('/api/rescore', methods=['POST'])
+def rescore_results():
+    """Re-scores results produced by the local fallback scorer."""
+    max_limit = app.config['RESCORE_MAX_LIMIT']
+    limit = max(0, min(request.args.get('limit', max_limit, type=int), max_limit))
+    rescored = rescore_fallback_results(limit, app.config['RESCORE_TIME_BUDGET'])
+    pending = pending_rescore_query().count()
+    failed = AnalysisResult.query.filter(
+        AnalysisResult.source == LOCAL_SOURCE,
+        AnalysisResult.rescore_attempts >= app.config['RESCORE_MAX_ATTEMPTS']
+    ).count()
+    return jsonify({
+        "message": f"Re-scored {rescored} results, {pending} still pending.",
+        "rescored_count": rescored,
+        "pending_count": pending,
+        "failed_count": failed
+    }), 200
+
+# API to export analysis results as a streamed file
+@app.route('/api/export', methods=['GET'])
+def export_results():
+    """Streams candidates and their analysis as CSV, NDJSON or Parquet."""
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    if export_format == 'parquet' and not parquet_available():
+        return jsonify({"error": "Parquet export requires pyarrow to be installed"}), 400
+
+    job_id = request.args.get('job_id', type=int)
+    if job_id is not None and not db.session.get(Job, job_id):
+        return jsonify({"error": "Job not found"}), 404
+    # Same 65% threshold as the shortlist
+    shortlisted = request.args.get('shortlisted', 'false').lower() == 'true'
+    min_score = 65 if shortlisted else None
+
+    stream, mimetype, extension = EXPORT_FORMATS[export_format]
+    rows = iter_result_rows(job_id=job_id, min_score=min_score)
+    filename = f"results_job_{job_id}.{extension}" if job_id else f"results.{extension}"
+    return Response(
+        stream_with_context(stream(rows)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}', 'X-Accel-Buffering': 'no'}
+    )
+
 # API to update candidate email
 @app.route('/api/candidate/<int:candidate_id>/email', methods=['PUT'])
 def update_candidate_email(candidate_id):
@@ -444,7 +660,7 @@ if __name__ == '__main__':
     import sys
     try:
         with app.app_context():
-            db.create_all()  # Create database tables if they don't exist
+            create_tables()  # Create database tables and add any new columns
         # Use reloader_type='stat' for better stability on Windows
         app.run(debug=True, port=5001, reloader_type='stat')
     except Exception as e:
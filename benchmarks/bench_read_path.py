@@ -0,0 +1,98 @@
+# benchmarks/bench_read_path.py
+# Compares the ORM + to_dict() + jsonify read path with the column-projected
+# read path in services/read_service.py on a synthetic in-memory database.
+#
+# Usage: python benchmarks/bench_read_path.py [--candidates 5000] [--repeat 5]
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from database import db, Job, Candidate, AnalysisResult
+from services import read_service
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+def populate(candidate_count):
+    job = Job(title="Backend Engineer", company="Acme", description="Python, Flask, SQL " * 50)
+    db.session.add(job)
+    db.session.flush()
+    for i in range(candidate_count):
+        db.session.add(Candidate(id=i + 1, name=f"Candidate {i}", email=f"c{i}@example.com",
+                                 resume_filename=f"resume_{i}.pdf", job_id=job.id))
+        db.session.add(AnalysisResult(
+            score=40 + i % 60,
+            verdict="High" if i % 3 == 0 else "Medium",
+            summary="Strong background in backend development and databases. " * 4,
+            feedback="Add measurable outcomes for each project. " * 4,
+            missing_skills=json.dumps(["Kubernetes", "Terraform", "GraphQL"]),
+            candidate_id=i + 1
+        ))
+    db.session.commit()
+    return job.id
+
+def orm_results(job_id):
+    candidates = Candidate.query.filter_by(job_id=job_id).order_by(Candidate.id.desc()).all()
+    return json.dumps([c.to_dict() for c in candidates]).encode("utf-8")
+
+def projected_results(job_id):
+    return read_service.dumps(read_service.get_job_results(job_id))
+
+def orm_shortlisted():
+    rows = db.session.query(Candidate, Job, AnalysisResult).join(
+        AnalysisResult, Candidate.id == AnalysisResult.candidate_id
+    ).join(
+        Job, Candidate.job_id == Job.id
+    ).filter(AnalysisResult.score >= 65).order_by(AnalysisResult.score.desc()).all()
+    return json.dumps([{
+        'id': c.id, 'name': c.name, 'email': c.email or '', 'resume_filename': c.resume_filename,
+        'job_title': j.title, 'company': j.company, 'job_id': j.id,
+        'score': a.score, 'verdict': a.verdict, 'summary': a.summary
+    } for c, j, a in rows]).encode("utf-8")
+
+def projected_shortlisted():
+    return read_service.dumps(read_service.get_shortlisted(65))
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        db.session.expunge_all() # Start each run with an empty identity map
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API read paths.")
+    parser.add_argument('--candidates', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        job_id = populate(args.candidates)
+        print(f"{args.candidates} candidates, best of {args.repeat} runs, "
+              f"JSON encoder: {'orjson' if read_service.orjson else 'json'}")
+
+        for name, old, new in [
+            ("/api/results", lambda: orm_results(job_id), lambda: projected_results(job_id)),
+            ("/api/shortlisted", orm_shortlisted, projected_shortlisted),
+        ]:
+            old_time = best_time(old, args.repeat)
+            new_time = best_time(new, args.repeat)
+            print(f"{name:18} ORM: {old_time * 1000:8.1f} ms   projected: {new_time * 1000:8.1f} ms   "
+                  f"speedup: {old_time / new_time:4.1f}x")
+
+if __name__ == '__main__':
+    main()
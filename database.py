@@ -3,6 +3,30 @@ from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
 
+def create_tables():
+    """
+    Creates missing tables and adds nullable columns, and their indexes,
+    introduced after a table was first created, since create_all() never
+    alters existing tables.
+    """
+    db.create_all()
+    inspector = db.inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                connection.execute(db.text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+                print(f"Added column {table.name}.{column.name}")
+
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
+                    print(f"Added index {index.name}")
+
 class Job(db.Model):
     """Represents a job description in the database."""
     id = db.Column(db.Integer, primary_key=True)
@@ -27,6 +51,7 @@ class Candidate(db.Model):
     resume_filename = db.Column(db.String(255), nullable=False)
     job_id = db.Column(db.Integer, db.ForeignKey('job.id'), nullable=False)
     analysis = db.relationship('AnalysisResult', backref='candidate', uselist=False, cascade="all, delete-orphan")
+    fingerprint = db.relationship('ResumeFingerprint', foreign_keys='ResumeFingerprint.candidate_id', uselist=False, cascade="all, delete-orphan")
 
     def to_dict(self):
         return {
@@ -46,6 +71,10 @@ class AnalysisResult(db.Model):
     summary = db.Column(db.Text, nullable=False)
     feedback = db.Column(db.Text, nullable=False)
     missing_skills = db.Column(db.Text, nullable=True) # Storing as JSON string
+    tier = db.Column(db.String(20), nullable=True) # Routing tier that produced the result ("fast" or "detailed")
+    source = db.Column(db.String(20), nullable=True, index=True) # "gemini", or "local" while waiting for AI re-scoring
+    rescore_attempts = db.Column(db.Integer, nullable=True) # AI re-scoring attempts of a local result
+    rescore_claimed_at = db.Column(db.Float, nullable=True) # time.time() when a worker claimed it for re-scoring
     candidate_id = db.Column(db.Integer, db.ForeignKey('candidate.id'), nullable=False, unique=True)
 
     def to_dict(self):
@@ -56,5 +85,34 @@ class AnalysisResult(db.Model):
             'summary': self.summary,
             'feedback': self.feedback,
             'missing_skills': self.missing_skills,
+            'tier': self.tier,
+            'source': self.source,
             'candidate_id': self.candidate_id
-        }
\ No newline at end of file
+        }
+class ResumeFingerprint(db.Model):
+    """Stores the content hash and SimHash of an uploaded resume for duplicate detection."""
+    id = db.Column(db.Integer, primary_key=True)
+    candidate_id = db.Column(db.Integer, db.ForeignKey('candidate.id'), nullable=False, unique=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('job.id'), nullable=False, index=True)
+    content_hash = db.Column(db.String(64), nullable=False, index=True)
+    simhash = db.Column(db.String(16), nullable=False) # 64-bit SimHash as hex
+    # LSH bands of the SimHash, indexed so near duplicates can be looked up without a full scan
+    band_0 = db.Column(db.Integer, nullable=False, index=True)
+    band_1 = db.Column(db.Integer, nullable=False, index=True)
+    band_2 = db.Column(db.Integer, nullable=False, index=True)
+    band_3 = db.Column(db.Integer, nullable=False, index=True)
+    band_4 = db.Column(db.Integer, nullable=False, index=True)
+    band_5 = db.Column(db.Integer, nullable=False, index=True)
+    band_6 = db.Column(db.Integer, nullable=False, index=True)
+    band_7 = db.Column(db.Integer, nullable=False, index=True)
+    duplicate_of_id = db.Column(db.Integer, db.ForeignKey('candidate.id'), nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'candidate_id': self.candidate_id,
+            'job_id': self.job_id,
+            'content_hash': self.content_hash,
+            'simhash': self.simhash,
+            'duplicate_of_id': self.duplicate_of_id
+        }
@@ -0,0 +1,39 @@
+# export_results.py
+import sys
+import argparse
+import contextlib
+
+# Keep startup messages out of the export when writing to stdout
+with contextlib.redirect_stdout(sys.stderr):
+    from app import app
+from services.export_service import EXPORT_FORMATS, iter_result_rows, parquet_available
+
+def main():
+    parser = argparse.ArgumentParser(description="Export candidates and their analysis results.")
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv', help="Output format (default: csv)")
+    parser.add_argument('--job-id', type=int, help="Only export candidates of this job")
+    parser.add_argument('--shortlisted', action='store_true', help="Only export candidates scoring 65% or higher")
+    parser.add_argument('--output', '-o', help="Output file (default: stdout)")
+    args = parser.parse_args()
+
+    if args.format == 'parquet' and not parquet_available():
+        sys.exit("Parquet export requires pyarrow. Install it with 'pip install pyarrow'.")
+
+    stream = EXPORT_FORMATS[args.format][0]
+    binary = args.format == 'parquet'
+    if args.output:
+        out = open(args.output, 'wb' if binary else 'w', newline=None if binary else '')
+    else:
+        out = sys.stdout.buffer if binary else sys.stdout
+
+    with app.app_context():
+        rows = iter_result_rows(job_id=args.job_id, min_score=65 if args.shortlisted else None)
+        try:
+            for chunk in stream(rows):
+                out.write(chunk)
+        finally:
+            if args.output:
+                out.close()
+
+if __name__ == '__main__':
+    main()
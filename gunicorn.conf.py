@@ -0,0 +1,32 @@
+# gunicorn.conf.py
+# Production server settings. Start with: gunicorn -c gunicorn.conf.py wsgi:app
+import os
+import multiprocessing
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5001')}"
+
+# Prefork workers scale with cores; each worker runs a few threads so a slow
+# Gemini call only occupies one thread instead of a whole worker process.
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+# Resume batches are analyzed inside the upload request, so allow long requests
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '300'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+# Load the app once in the master and fork workers from it
+preload_app = True
+
+# Recycle workers periodically to bound memory growth from PDF parsing
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = 100
+
+accesslog = '-'
+errorlog = '-'
+
+def post_fork(server, worker):
+    """Gives each worker its own database connections and Gemini client."""
+    from app import init_worker
+    init_worker()
@@ -1,8 +1,30 @@
 # init_db.py
-from app import app, db
+import os
+from app import app, db, extract_text_from_pdf
+from database import Candidate, ResumeFingerprint, create_tables
+from services.dedup_service import compute_fingerprint, save_fingerprint
+
+def backfill_fingerprints():
+    """Fingerprints resumes uploaded before duplicate detection existed."""
+    count = 0
+    candidates = Candidate.query.outerjoin(
+        ResumeFingerprint, ResumeFingerprint.candidate_id == Candidate.id
+    ).filter(ResumeFingerprint.id.is_(None)).all()
+    for candidate in candidates:
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], candidate.resume_filename)
+        if not os.path.exists(filepath):
+            continue
+        resume_text = extract_text_from_pdf(filepath)
+        if not resume_text:
+            continue
+        save_fingerprint(compute_fingerprint(resume_text), candidate.id, candidate.job_id)
+        count += 1
+    db.session.commit()
+    return count
 
 if __name__ == '__main__':
     with app.app_context():
         print("Creating database tables...")
-        db.create_all()
-        print("Database tables created successfully!")
\ No newline at end of file
+        create_tables()
+        print("Database tables created successfully!")
+        print(f"Fingerprinted {backfill_fingerprints()} existing resumes.")
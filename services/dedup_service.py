@@ -0,0 +1,129 @@
+# services/dedup_service.py
+import re
+import hashlib
+from database import db, ResumeFingerprint
+
+SIMHASH_BITS = 64
+BAND_COUNT = 8
+BAND_BITS = SIMHASH_BITS // BAND_COUNT
+BAND_MASK = (1 << BAND_BITS) - 1
+
+# With 8 bands of 8 bits, any two fingerprints within a Hamming distance of 7
+# are guaranteed to share at least one band, so band lookups never miss them.
+# Resumes with a handful of edited words typically land 2-7 bits apart, while
+# unrelated resumes sit around 32.
+DEFAULT_MAX_DISTANCE = BAND_COUNT - 1
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def normalize_text(text):
+    """Lowercases the text and collapses it into a list of word tokens."""
+    return _TOKEN_PATTERN.findall((text or "").lower())
+
+def content_hash(text):
+    """Returns a SHA-256 hex digest of the normalized text, used for exact matches."""
+    return hashlib.sha256(" ".join(normalize_text(text)).encode("utf-8")).hexdigest()
+
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+def simhash(text):
+    """
+    Computes a 64-bit SimHash of the text from word bigram shingles.
+    Lightly edited documents produce fingerprints a few bits apart.
+    """
+    tokens = normalize_text(text)
+    if len(tokens) > 1:
+        features = [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    else:
+        features = tokens
+
+    weights = {}
+    for feature in features:
+        weights[feature] = weights.get(feature, 0) + 1
+
+    vector = [0] * SIMHASH_BITS
+    for feature, weight in weights.items():
+        h = _feature_hash(feature)
+        for bit in range(SIMHASH_BITS):
+            if h >> bit & 1:
+                vector[bit] += weight
+            else:
+                vector[bit] -= weight
+
+    fingerprint = 0
+    for bit, value in enumerate(vector):
+        if value > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+def simhash_bands(fingerprint):
+    """Splits a fingerprint into BAND_COUNT integers used as LSH bucket keys."""
+    return [(fingerprint >> (i * BAND_BITS)) & BAND_MASK for i in range(BAND_COUNT)]
+
+def hamming_distance(a, b):
+    """Number of differing bits between two fingerprints."""
+    return bin(a ^ b).count("1")
+
+def compute_fingerprint(text):
+    """
+    Builds the fingerprint fields stored for a resume.
+
+    Returns:
+        A dictionary with the exact content hash, the SimHash as a hex string
+        and its LSH bands.
+    """
+    fingerprint = simhash(text)
+    return {
+        "content_hash": content_hash(text),
+        "simhash": f"{fingerprint:016x}",
+        "bands": simhash_bands(fingerprint),
+    }
+
+def find_duplicate(fingerprint, job_id=None, max_distance=DEFAULT_MAX_DISTANCE):
+    """
+    Looks up an already uploaded resume matching the given fingerprint.
+
+    Exact matches on the content hash win over near matches; near matches are
+    found through the LSH band index and confirmed by Hamming distance. Pass
+    job_id to restrict the search to one job, or None to search globally.
+
+    Returns:
+        A dictionary with the matched 'fingerprint' row, the 'match' kind
+        ("exact" or "near") and the Hamming 'distance', or None.
+    """
+    query = ResumeFingerprint.query
+    if job_id is not None:
+        query = query.filter(ResumeFingerprint.job_id == job_id)
+
+    exact = query.filter(
+        ResumeFingerprint.content_hash == fingerprint["content_hash"]
+    ).order_by(ResumeFingerprint.id).first()
+    if exact:
+        return {"fingerprint": exact, "match": "exact", "distance": 0}
+
+    bands = fingerprint["bands"]
+    candidates = query.filter(db.or_(*[
+        getattr(ResumeFingerprint, f"band_{i}") == band for i, band in enumerate(bands)
+    ])).order_by(ResumeFingerprint.id).all()
+
+    target = int(fingerprint["simhash"], 16)
+    best = None
+    for row in candidates:
+        distance = hamming_distance(target, int(row.simhash, 16))
+        if distance <= max_distance and (best is None or distance < best["distance"]):
+            best = {"fingerprint": row, "match": "near", "distance": distance}
+    return best
+
+def save_fingerprint(fingerprint, candidate_id, job_id, duplicate_of_id=None):
+    """Adds a fingerprint row for a candidate to the session (caller commits)."""
+    row = ResumeFingerprint(
+        candidate_id=candidate_id,
+        job_id=job_id,
+        content_hash=fingerprint["content_hash"],
+        simhash=fingerprint["simhash"],
+        duplicate_of_id=duplicate_of_id,
+        **{f"band_{i}": band for i, band in enumerate(fingerprint["bands"])}
+    )
+    db.session.add(row)
+    return row
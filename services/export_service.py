@@ -0,0 +1,186 @@
+# services/export_service.py
+import io
+import csv
+import json
+from database import db, Job, Candidate, AnalysisResult
+from services.read_service import ai_scored
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError: # Parquet export is optional
+    pa = None
+    pq = None
+
+EXPORT_COLUMNS = [
+    "candidate_id", "name", "email", "resume_filename", "job_id", "job_title", "company",
+    "score", "verdict", "summary", "feedback", "missing_skills", "tier", "source",
+]
+
+# Text exports are yielded in chunks of about this many characters, so a large
+# export is sent in a few sizeable writes rather than one write per row
+CHUNK_SIZE = 64 * 1024
+
+def iter_result_rows(job_id=None, min_score=None, batch_size=1000):
+    """
+    Yields one dictionary per candidate with its job and analysis columns.
+
+    Rows are fetched in keyset-paginated batches of batch_size, so memory
+    use stays flat no matter how many candidates are exported. Each batch is
+    read in its own short transaction: no cursor or SQLite read lock is held
+    while the consumer, such as a slow download, is paused between rows.
+    """
+    stmt = db.select(
+        Candidate.id.label("candidate_id"),
+        Candidate.name,
+        Candidate.email,
+        Candidate.resume_filename,
+        Job.id.label("job_id"),
+        Job.title.label("job_title"),
+        Job.company,
+        AnalysisResult.score,
+        AnalysisResult.verdict,
+        AnalysisResult.summary,
+        AnalysisResult.feedback,
+        AnalysisResult.missing_skills,
+        AnalysisResult.tier,
+        AnalysisResult.source,
+    ).join(
+        Job, Candidate.job_id == Job.id
+    ).outerjoin(
+        AnalysisResult, Candidate.id == AnalysisResult.candidate_id
+    )
+    if job_id is not None:
+        stmt = stmt.where(Candidate.job_id == job_id)
+    if min_score is not None:
+        # Like the shortlist, only AI-scored results count
+        stmt = stmt.where(AnalysisResult.score >= min_score, ai_scored())
+    stmt = stmt.order_by(Candidate.id).limit(batch_size)
+
+    last_id = 0
+    while True:
+        batch = db.session.execute(stmt.where(Candidate.id > last_id)).all()
+        # End the read transaction before handing out any rows
+        db.session.commit()
+        for row in batch:
+            data = row._asdict()
+            data["missing_skills"] = _decode_skills(data["missing_skills"])
+            yield data
+        if len(batch) < batch_size:
+            break
+        last_id = batch[-1].candidate_id
+
+def _decode_skills(missing_skills):
+    if not missing_skills:
+        return []
+    try:
+        return json.loads(missing_skills)
+    except (TypeError, ValueError):
+        return [missing_skills]
+
+class _Echo:
+    """File-like object whose write() hands the written text straight back, for csv.writer."""
+    def write(self, value):
+        return value
+
+def _chunked(lines, chunk_size=CHUNK_SIZE):
+    """Joins lines of text into chunks of about chunk_size characters."""
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer)
+
+def _csv_lines(rows):
+    writer = csv.writer(_Echo())
+    for row in rows:
+        row["missing_skills"] = "; ".join(row["missing_skills"])
+        yield writer.writerow([row[column] for column in EXPORT_COLUMNS])
+
+def stream_csv(rows):
+    """Yields the CSV header right away, then the rows in chunks of about CHUNK_SIZE characters."""
+    yield csv.writer(_Echo()).writerow(EXPORT_COLUMNS)
+    yield from _chunked(_csv_lines(rows))
+
+def stream_ndjson(rows):
+    """Yields one JSON object per line, in chunks of about CHUNK_SIZE characters."""
+    yield from _chunked(json.dumps(row) + "\n" for row in rows)
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only stream that buffers bytes until they are drained by the caller."""
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def _parquet_schema():
+    return pa.schema([
+        ("candidate_id", pa.int64()),
+        ("name", pa.string()),
+        ("email", pa.string()),
+        ("resume_filename", pa.string()),
+        ("job_id", pa.int64()),
+        ("job_title", pa.string()),
+        ("company", pa.string()),
+        ("score", pa.int64()),
+        ("verdict", pa.string()),
+        ("summary", pa.string()),
+        ("feedback", pa.string()),
+        ("missing_skills", pa.list_(pa.string())),
+        ("tier", pa.string()),
+        ("source", pa.string()),
+    ])
+
+def stream_parquet(rows, batch_size=1000):
+    """Yields a Parquet file as bytes, writing one row group per batch_size rows."""
+    if pa is None:
+        raise RuntimeError("Parquet export requires pyarrow. Install it with 'pip install pyarrow'.")
+
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    batch = []
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch = []
+                yield sink.drain()
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    finally:
+        writer.close()
+    yield sink.drain()
+
+# Format name -> (stream function, mimetype, file extension)
+EXPORT_FORMATS = {
+    "csv": (stream_csv, "text/csv", "csv"),
+    "ndjson": (stream_ndjson, "application/x-ndjson", "ndjson"),
+    "parquet": (stream_parquet, "application/vnd.apache.parquet", "parquet"),
+}
+
+def parquet_available():
+    """True if pyarrow is installed and Parquet export can be used."""
+    return pa is not None
@@ -1,8 +1,10 @@
 # services/gemini_service.py
 import os
 import json
+import time
 import google.generativeai as genai
 from dotenv import load_dotenv
+from services.local_scorer import score_resume
 
 # Load environment variables and configure the API key
 load_dotenv()
@@ -11,17 +13,76 @@ if not API_KEY:
     raise ValueError("GOOGLE_API_KEY not found. Please set it in your .env file.")
 genai.configure(api_key=API_KEY)
 
-def get_gemini_analysis(job_description_text, resume_text):
+def configure_client():
     """
-    Analyzes a resume against a job description using the Gemini API.
-
-    Returns:
-        A dictionary containing the structured analysis results or an error.
+    Reconfigures the Gemini client, dropping any cached API connections.
+    Call once in each worker process after fork; gRPC channels must not be shared across processes.
     """
-    model = genai.GenerativeModel('gemini-1.5-flash-latest')
-    
-    # The detailed prompt for the AI model
-    prompt = f"""
+    genai.configure(api_key=API_KEY)
+
+# Tiered model routing: every resume gets a cheap score-only first pass, and
+# only candidates whose score is within ANALYSIS_ROUTING_MARGIN points of the
+# shortlisting threshold (or clearly above it, when ANALYSIS_FEEDBACK_FOR_SHORTLISTED
+# asks for full feedback on shortlists) are re-scored with the detailed prompt.
+# Re-scored resumes pay for both calls, so tiering only saves when most scores
+# fall well below the threshold; set ANALYSIS_ROUTING to "detailed" to always
+# use the detailed prompt when most of them do not.
+ANALYSIS_ROUTING = os.getenv("ANALYSIS_ROUTING", "tiered").lower()
+FAST_MODEL = os.getenv("GEMINI_FAST_MODEL", "gemini-1.5-flash-8b-latest")
+DETAILED_MODEL = os.getenv("GEMINI_DETAILED_MODEL", "gemini-1.5-flash-latest")
+ANALYSIS_ROUTING_MARGIN = int(os.getenv("ANALYSIS_ROUTING_MARGIN", "10"))
+FEEDBACK_FOR_SHORTLISTED = os.getenv("ANALYSIS_FEEDBACK_FOR_SHORTLISTED", "false").lower() == "true"
+
+# After a quota error, skip Gemini calls for this many seconds and let callers
+# fall back to the local scorer instead of waiting on more rejected requests.
+# The end of the cooldown is written to QUOTA_STATE_FILE, so one worker's quota
+# error pauses every gunicorn worker, not just the process that hit it.
+QUOTA_COOLDOWN_SECONDS = int(os.getenv("GEMINI_QUOTA_COOLDOWN", "60"))
+QUOTA_STATE_FILE = os.getenv(
+    "GEMINI_QUOTA_STATE_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "gemini_quota_until")
+)
+_quota_exhausted_until = 0.0 # Wall-clock time, comparable across processes
+
+def is_quota_error(error_str):
+    """True if an API error message reports exhausted quota or rate limiting."""
+    return "quota" in error_str.lower() or "429" in error_str
+
+def mark_quota_exhausted():
+    """Starts the quota cooldown period in this and every other worker process."""
+    global _quota_exhausted_until
+    _quota_exhausted_until = time.time() + QUOTA_COOLDOWN_SECONDS
+    try:
+        os.makedirs(os.path.dirname(QUOTA_STATE_FILE), exist_ok=True)
+        # Write then rename, so other workers never read a partial timestamp
+        temp_file = f"{QUOTA_STATE_FILE}.{os.getpid()}"
+        with open(temp_file, "w") as f:
+            f.write(repr(_quota_exhausted_until))
+        os.replace(temp_file, QUOTA_STATE_FILE)
+    except OSError as e:
+        print(f"Could not share the quota cooldown with other workers: {e}")
+
+def quota_available():
+    """False while the quota cooldown period started by any worker process is running."""
+    global _quota_exhausted_until
+    now = time.time()
+    if now < _quota_exhausted_until:
+        return False
+    try:
+        with open(QUOTA_STATE_FILE) as f:
+            _quota_exhausted_until = max(_quota_exhausted_until, float(f.read()))
+    except (OSError, ValueError):
+        return True
+    return now >= _quota_exhausted_until
+
+def _quota_error():
+    return {"error": "API quota exceeded", "quota_exceeded": True}
+
+REQUIRED_ANALYSIS_KEYS = ["relevance_score", "fit_verdict", "summary", "personalized_feedback", "missing_skills"]
+
+def build_analysis_prompt(job_description_text, resume_text):
+    """Builds the resume analysis prompt sent to the Gemini API."""
+    return f"""
     You are an expert HR recruitment assistant. Your task is to analyze a candidate's resume against a job description with extreme accuracy.
 
     **Job Description:**
@@ -36,7 +97,7 @@ def get_gemini_analysis(job_description_text, resume_text):
 
     Based on the analysis, provide the following information in a single, valid JSON object ONLY. Do not add any text, explanations, or markdown formatting before or after the JSON object.
 
-    The JSON object must have these exact keys:
+    The JSON object must have these exact keys, in this order:
     - "relevance_score": An integer from 0 to 100 on how well the resume matches the job description.
     - "fit_verdict": A string which can only be one of three values: "High", "Medium", or "Low".
     - "summary": A concise paragraph summarizing the candidate's strengths and weaknesses for this specific role.
@@ -44,21 +105,48 @@ def get_gemini_analysis(job_description_text, resume_text):
     - "missing_skills": A list of strings, where each string is a key skill, certification, or experience from the job description that is missing or not clearly stated in the resume.
     """
 
+def parse_analysis_response(response_text, defaults=None):
+    """
+    Parses and validates the JSON analysis returned by the model.
+    Keys in defaults are filled in when the model omits them.
+    Raises json.JSONDecodeError or ValueError if the response is unusable.
+    """
+    # Clean up the response to ensure it's valid JSON
+    json_text = response_text.strip().lstrip("```json").rstrip("```").strip()
+
+    # Parse the JSON string into a Python dictionary
+    analysis_result = json.loads(json_text)
+    for key, value in (defaults or {}).items():
+        analysis_result.setdefault(key, value)
+
+    # Data validation to ensure the AI followed instructions
+    if not all(k in analysis_result for k in REQUIRED_ANALYSIS_KEYS):
+        raise ValueError("AI response is missing one or more required keys.")
+    if not isinstance(analysis_result["relevance_score"], int):
+         raise ValueError("AI response 'relevance_score' is not an integer.")
+
+    return analysis_result
+
+def get_gemini_analysis(job_description_text, resume_text, model_name=DETAILED_MODEL):
+    """
+    Analyzes a resume against a job description using the Gemini API.
+
+    Returns:
+        A dictionary containing the structured analysis results or an error.
+        Quota errors are flagged with "quota_exceeded" so callers can fall
+        back to the local scorer.
+    """
+    if not quota_available():
+        return _quota_error()
+
+    model = genai.GenerativeModel(model_name)
+    
+    # The detailed prompt for the AI model
+    prompt = build_analysis_prompt(job_description_text, resume_text)
+
     try:
         response = model.generate_content(prompt)
-        # Clean up the response to ensure it's valid JSON
-        json_text = response.text.strip().lstrip("```json").rstrip("```").strip()
-        
-        # Parse the JSON string into a Python dictionary
-        analysis_result = json.loads(json_text)
-        
-        # Data validation to ensure the AI followed instructions
-        if not all(k in analysis_result for k in ["relevance_score", "fit_verdict", "summary", "personalized_feedback", "missing_skills"]):
-            raise ValueError("AI response is missing one or more required keys.")
-        if not isinstance(analysis_result["relevance_score"], int):
-             raise ValueError("AI response 'relevance_score' is not an integer.")
-
-        return analysis_result
+        return parse_analysis_response(response.text)
 
     except json.JSONDecodeError:
         print("Error: Failed to decode JSON from Gemini response.")
@@ -69,66 +157,209 @@ def get_gemini_analysis(job_description_text, resume_text):
         print(f"An unexpected error occurred: {e}")
         
         # Check if it's a quota exceeded error
-        if "quota" in error_str.lower() or "429" in error_str:
-            print("API quota exceeded, using mock analysis data")
-            return get_mock_analysis_data()
+        if is_quota_error(error_str):
+            print("API quota exceeded, pausing Gemini calls")
+            mark_quota_exhausted()
+            return _quota_error()
         
         return {"error": error_str}
 
-def get_mock_analysis_data():
+def build_quick_prompt(job_description_text, resume_text):
+    """Builds the short score-only prompt used for the first routing pass."""
+    return f"""
+    You are an expert HR recruitment assistant. Score how well the candidate's resume matches the job description.
+
+    **Job Description:**
+    ---
+    {job_description_text}
+    ---
+
+    **Candidate's Resume:**
+    ---
+    {resume_text}
+    ---
+
+    Respond with a single, valid JSON object ONLY, with these exact keys:
+    - "relevance_score": An integer from 0 to 100.
+    - "fit_verdict": One of "High", "Medium", or "Low".
+    - "summary": One sentence on the candidate's fit for this role.
+    - "missing_skills": A list of at most 5 key skills from the job description missing in the resume.
     """
-    Provides mock analysis data when API quota is exceeded.
-    Returns a realistic analysis result for testing purposes.
+
+def get_quick_analysis(job_description_text, resume_text, model_name=FAST_MODEL):
     """
-    import random
-    
-    # Generate random but realistic scores and verdicts
-    score = random.randint(65, 95)
-    
-    if score >= 85:
-        verdict = "High"
-    elif score >= 70:
-        verdict = "Medium"
+    Scores a resume with the fast model and the short prompt.
+
+    Returns:
+        A dictionary in the same shape as get_gemini_analysis(), with empty
+        personalized feedback, or a dictionary with an "error" key.
+    """
+    if not quota_available():
+        return _quota_error()
+
+    model = genai.GenerativeModel(model_name)
+    prompt = build_quick_prompt(job_description_text, resume_text)
+
+    try:
+        response = model.generate_content(prompt)
+        return parse_analysis_response(response.text, defaults={"personalized_feedback": "", "missing_skills": []})
+
+    except Exception as e:
+        print(f"Quick analysis failed: {e}")
+        if is_quota_error(str(e)):
+            mark_quota_exhausted()
+            return _quota_error()
+        return {"error": str(e)}
+
+def needs_detailed_analysis(score, threshold):
+    """
+    Decides whether a first-pass score should be re-scored with the detailed prompt.
+    Borderline scores always are; clear shortlists only when ANALYSIS_FEEDBACK_FOR_SHORTLISTED is set.
+    """
+    if abs(score - threshold) <= ANALYSIS_ROUTING_MARGIN:
+        return True
+    return score >= threshold and FEEDBACK_FOR_SHORTLISTED
+
+def get_routed_analysis(job_description_text, resume_text, threshold=65):
+    """
+    Analyzes a resume following the ANALYSIS_ROUTING policy.
+
+    Returns:
+        A dictionary like get_gemini_analysis() with an extra "tier" key
+        ("fast" or "detailed") naming the pass that produced it, or an error.
+    """
+    if ANALYSIS_ROUTING == "tiered":
+        quick_result = get_quick_analysis(job_description_text, resume_text)
+        if quick_result.get("quota_exceeded"):
+            return quick_result
+        if "error" not in quick_result and not needs_detailed_analysis(quick_result["relevance_score"], threshold):
+            quick_result["tier"] = "fast"
+            return quick_result
     else:
-        verdict = "Low"
-    
-    # Various summary templates
-    summaries = [
-        "This candidate demonstrates strong technical skills and relevant experience. The resume shows excellent alignment with job requirements, with particular strengths in problem-solving and technical implementation.",
-        "The applicant has solid experience and shows good potential for the role. Strong educational background with practical experience in relevant technologies and methodologies.",
-        "Candidate shows promising technical abilities with hands-on experience. Good foundation in core competencies required for this position with room for growth.",
-        "Well-rounded professional with diverse experience across multiple domains. Demonstrates adaptability and continuous learning mindset with relevant skill set.",
-        "Strong candidate with proven track record in similar roles. Excellent technical expertise combined with good communication and collaboration skills."
-    ]
-    
-    # Various feedback templates
-    feedbacks = [
-        "Consider highlighting specific project outcomes and quantifiable achievements. Adding more details about leadership experience and cross-functional collaboration would strengthen the application.",
-        "Recommend emphasizing measurable results from past projects. Include more information about technical certifications and continuous learning initiatives.",
-        "Focus on demonstrating problem-solving abilities with concrete examples. Consider adding information about mentoring experience and team contributions.",
-        "Strengthen the resume by including specific technologies used and their impact. Add details about process improvements and innovation contributions.",
-        "Enhance the application by showcasing client interaction experience and business impact. Include information about training and knowledge sharing activities."
-    ]
-    
-    # Various missing skills options
-    missing_skills_options = [
-        ["Advanced Analytics", "Team Leadership", "Project Management"],
-        ["Cloud Architecture", "DevOps Practices", "Agile Methodologies"],
-        ["Machine Learning", "Data Visualization", "Statistical Analysis"],
-        ["System Design", "Performance Optimization", "Security Best Practices"],
-        ["Strategic Planning", "Stakeholder Management", "Business Analysis"],
-        ["Quality Assurance", "Testing Frameworks", "Continuous Integration"]
-    ]
-    
-    mock_data = {
-        "relevance_score": score,
-        "fit_verdict": verdict,
-        "summary": random.choice(summaries),
-        "personalized_feedback": random.choice(feedbacks),
-        "missing_skills": random.choice(missing_skills_options)
-    }
-    
-    return mock_data
+        quick_result = None
+
+    analysis_result = get_gemini_analysis(job_description_text, resume_text)
+    if "error" in analysis_result and quick_result and "error" not in quick_result:
+        # The first pass still gives a usable score if the detailed pass fails
+        quick_result["tier"] = "fast"
+        return quick_result
+    if "error" not in analysis_result:
+        analysis_result["tier"] = "detailed"
+    return analysis_result
+
+class IncrementalJSONParser:
+    """
+    Parses a JSON object that arrives in chunks and reports each top-level
+    field as soon as its value is complete, before the whole object is.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = None # Index just past the last field consumed
+        self._decoder = json.JSONDecoder()
+        self.fields = {}
+
+    def _skip_whitespace(self, pos):
+        while pos < len(self._buffer) and self._buffer[pos].isspace():
+            pos += 1
+        return pos
+
+    def feed(self, chunk):
+        """
+        Appends a chunk of text and returns a list of (key, value) pairs for
+        the fields completed by it.
+        """
+        self._buffer += chunk
+        completed = []
+
+        if self._pos is None:
+            # Skip any markdown fence or text before the object starts
+            start = self._buffer.find("{")
+            if start == -1:
+                return completed
+            self._pos = start + 1
+
+        buffer = self._buffer
+        while True:
+            pos = self._skip_whitespace(self._pos)
+            if pos < len(buffer) and buffer[pos] == ",":
+                pos = self._skip_whitespace(pos + 1)
+            if pos >= len(buffer) or buffer[pos] == "}":
+                break
+            try:
+                key, pos = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break
+            pos = self._skip_whitespace(pos)
+            if pos >= len(buffer) or buffer[pos] != ":":
+                break
+            pos = self._skip_whitespace(pos + 1)
+            try:
+                value, end = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break
+            # Numbers and literals may still be growing until a delimiter follows them
+            if self._skip_whitespace(end) >= len(buffer):
+                break
+            self.fields[key] = value
+            completed.append((key, value))
+            self._pos = end
+
+        return completed
+
+def _stream_local_result(job_description_text, resume_text):
+    """Yields the local scorer's result as stream events."""
+    local_result = score_resume(job_description_text, resume_text)
+    for key in REQUIRED_ANALYSIS_KEYS:
+        yield {"event": "field", "key": key, "value": local_result[key]}
+    yield {"event": "result", "result": local_result}
+
+def stream_gemini_analysis(job_description_text, resume_text):
+    """
+    Streams a resume analysis from the Gemini API.
+
+    Yields dictionaries describing the progress:
+        {"event": "chunk", "text": ...} for each piece of raw model output,
+        {"event": "field", "key": ..., "value": ...} as soon as a field is complete,
+        and finally {"event": "result", "result": ...} or {"event": "error", "error": ...}.
+    """
+    if not quota_available():
+        # Still cooling down: answer locally without touching the cooldown
+        yield from _stream_local_result(job_description_text, resume_text)
+        return
+
+    parser = IncrementalJSONParser()
+    response_text = ""
+
+    try:
+        model = genai.GenerativeModel(DETAILED_MODEL)
+        prompt = build_analysis_prompt(job_description_text, resume_text)
+        response = model.generate_content(prompt, stream=True)
+        for chunk in response:
+            chunk_text = chunk.text
+            response_text += chunk_text
+            yield {"event": "chunk", "text": chunk_text}
+            for key, value in parser.feed(chunk_text):
+                yield {"event": "field", "key": key, "value": value}
+
+        yield {"event": "result", "result": parse_analysis_response(response_text)}
+
+    except json.JSONDecodeError:
+        print("Error: Failed to decode JSON from Gemini response.")
+        print("Raw response:", response_text)
+        yield {"event": "error", "error": "Invalid JSON response from AI."}
+    except Exception as e:
+        error_str = str(e)
+        print(f"An unexpected error occurred: {e}")
+
+        # Check if it's a quota exceeded error
+        if is_quota_error(error_str):
+            print("API quota exceeded, using the local scorer")
+            mark_quota_exhausted()
+            yield from _stream_local_result(job_description_text, resume_text)
+            return
+
+        yield {"event": "error", "error": error_str}
 
 def extract_job_title(job_description_text):
     """
@@ -151,7 +382,7 @@ def extract_job_title(job_description_text):
         print(f"Error extracting job title: {e}")
         
         # Return a default title if quota exceeded
-        if "quota" in error_str.lower() or "429" in error_str:
+        if is_quota_error(error_str):
             return "Job Position"
         
         return None
@@ -0,0 +1,118 @@
+# services/local_scorer.py
+import re
+import math
+from collections import Counter
+
+# Deterministic, CPU-only resume scoring from keyword overlap with the job
+# description. Used when the Gemini API is throttled or unavailable; its
+# results are stored with source "local" and re-scored by the AI later.
+
+LOCAL_SOURCE = "local"
+
+_TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9+#.]*[a-z0-9+#]|[a-z]")
+
+_STOPWORDS = frozenset("""
+a about above across after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each either etc every few for from
+further had has have having he her here hers him his how i if in into is it its itself just least less
+like ll make may me might more most must my no nor not now of off on once only or other our ours out
+over own per please plus same shall she should so some such than that the their theirs them then there
+these they this those through to too under until up upon us use used using very via was we well were
+what when where which while who whom why will with within without would you your yours
+ability able work working works role team teams candidate candidates job position responsibilities
+requirements required requirement preferred including include includes years year experience strong
+good excellent knowledge skills skill understanding familiarity proficiency proficient new help
+ensure company join looking opportunity related relevant various
+""".split())
+
+# Common skill and technology terms; job description keywords found here
+# weigh more than general vocabulary such as company or benefits text.
+SKILL_TERMS = frozenset("""
+python java javascript typescript c++ c# go golang rust ruby php scala kotlin swift r matlab sql nosql
+html css react angular vue node node.js django flask fastapi spring express rest graphql api apis
+microservices docker kubernetes terraform ansible jenkins ci cd devops git linux unix bash aws azure gcp
+cloud serverless spark hadoop kafka airflow databricks snowflake etl pipelines warehouse bigquery redshift
+postgresql mysql mongodb redis elasticsearch cassandra oracle excel tableau power bi looker visualization
+pandas numpy scipy matplotlib seaborn scikit sklearn tensorflow pytorch keras opencv nlp llm llms genai
+transformers ml ai machine learning deep statistics statistical analytics analysis modeling regression
+classification clustering forecasting optimization algorithms data science scientist engineer engineering
+security networking testing selenium pytest junit agile scrum jira figma ux ui android ios mobile embedded
+iot blockchain automation computer vision sap salesforce crm erp accounting finance marketing sales seo
+communication leadership management stakeholder documentation
+""".split())
+
+SKILL_WEIGHT = 3.0
+
+def tokenize(text):
+    """Lowercases the text and returns its meaningful word tokens."""
+    return [
+        token for token in _TOKEN_PATTERN.findall((text or "").lower())
+        if token not in _STOPWORDS and len(token) > 1
+    ]
+
+class KeywordScorer:
+    """
+    Scores resumes against one job description.
+
+    The job description's keywords and their weights are computed once, so a
+    whole batch of resumes is scored with one set intersection each.
+    """
+
+    def __init__(self, job_description_text, max_keywords=60):
+        counts = Counter(tokenize(job_description_text))
+        keywords = sorted(
+            counts.items(), key=lambda item: (item[0] not in SKILL_TERMS, -item[1], item[0])
+        )[:max_keywords]
+        # Repeated terms matter more, with diminishing returns
+        self.weights = {
+            term: (1.0 + math.log(count)) * (SKILL_WEIGHT if term in SKILL_TERMS else 1.0)
+            for term, count in keywords
+        }
+        self.total_weight = sum(self.weights.values())
+        self._ranked_terms = [term for term, _ in keywords]
+
+    def score(self, resume_text):
+        """
+        Returns an analysis dictionary in the same shape as the Gemini
+        analysis, with "source" set to "local".
+        """
+        resume_terms = set(tokenize(resume_text))
+        matched = resume_terms.intersection(self.weights)
+        matched_weight = sum(self.weights[term] for term in matched)
+        score = round(100 * matched_weight / self.total_weight) if self.total_weight else 0
+        missing = [term for term in self._ranked_terms if term not in matched][:10]
+
+        if score >= 75:
+            verdict = "High"
+        elif score >= 50:
+            verdict = "Medium"
+        else:
+            verdict = "Low"
+
+        summary = (
+            f"Estimated from keyword overlap: the resume mentions {len(matched)} of "
+            f"{len(self.weights)} key terms from the job description. "
+            "This is a provisional score pending AI analysis."
+        )
+        if missing:
+            feedback = "Consider highlighting experience with: " + ", ".join(missing[:5]) + "."
+        else:
+            feedback = "The resume covers the key terms of the job description."
+
+        return {
+            "relevance_score": score,
+            "fit_verdict": verdict,
+            "summary": summary,
+            "personalized_feedback": feedback,
+            "missing_skills": missing,
+            "source": LOCAL_SOURCE,
+        }
+
+def score_resumes(job_description_text, resume_texts):
+    """Scores a batch of resumes against one job description."""
+    scorer = KeywordScorer(job_description_text)
+    return [scorer.score(text) for text in resume_texts]
+
+def score_resume(job_description_text, resume_text):
+    """Scores a single resume against a job description."""
+    return KeywordScorer(job_description_text).score(resume_text)
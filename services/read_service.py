@@ -0,0 +1,162 @@
+# services/read_service.py
+import json
+from flask import Response
+from database import db, Job, Candidate, AnalysisResult
+from services.local_scorer import LOCAL_SOURCE
+
+try:
+    import orjson
+except ImportError: # Falls back to the standard library encoder
+    orjson = None
+
+# Read queries select only the columns they need. The result rows are
+# SQLAlchemy Row tuples rather than ORM objects, so no identity map,
+# attribute instrumentation or lazy relationship loads are involved.
+
+def dumps(data):
+    """Serializes data to JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+def json_response(data, status=200):
+    """Builds a JSON response with the fast encoder instead of jsonify."""
+    return Response(dumps(data), status=status, mimetype="application/json")
+
+_ANALYSIS_COLUMNS = (
+    AnalysisResult.id.label("analysis_id"),
+    AnalysisResult.score,
+    AnalysisResult.verdict,
+    AnalysisResult.summary,
+    AnalysisResult.feedback,
+    AnalysisResult.missing_skills,
+    AnalysisResult.tier,
+    AnalysisResult.source,
+)
+
+def get_job_results(job_id):
+    """
+    Returns the candidates of a job with their analysis, newest first.
+    Same shape as Candidate.to_dict(), loaded with a single query.
+    """
+    stmt = db.select(
+        Candidate.id,
+        Candidate.name,
+        Candidate.email,
+        Candidate.resume_filename,
+        Candidate.job_id,
+        *_ANALYSIS_COLUMNS,
+    ).outerjoin(
+        AnalysisResult, Candidate.id == AnalysisResult.candidate_id
+    ).where(
+        Candidate.job_id == job_id
+    ).order_by(Candidate.id.desc())
+
+    results = []
+    for row in db.session.execute(stmt):
+        analysis = None
+        if row.analysis_id is not None:
+            analysis = {
+                'id': row.analysis_id,
+                'score': row.score,
+                'verdict': row.verdict,
+                'summary': row.summary,
+                'feedback': row.feedback,
+                'missing_skills': row.missing_skills,
+                'tier': row.tier,
+                'source': row.source,
+                'candidate_id': row.id
+            }
+        results.append({
+            'id': row.id,
+            'name': row.name,
+            'email': row.email,
+            'resume_filename': row.resume_filename,
+            'job_id': row.job_id,
+            'analysis': analysis
+        })
+    return results
+
+def ai_scored():
+    """Filter excluding provisional results of the local scorer, which must not shortlist anyone."""
+    return db.or_(AnalysisResult.source.is_(None), AnalysisResult.source != LOCAL_SOURCE)
+
+def get_shortlisted(min_score):
+    """
+    Returns AI-scored candidates scoring at least min_score across all jobs,
+    best first.
+    """
+    stmt = db.select(
+        Candidate.id,
+        Candidate.name,
+        Candidate.email,
+        Candidate.resume_filename,
+        Job.id.label("job_id"),
+        Job.title.label("job_title"),
+        Job.company,
+        AnalysisResult.score,
+        AnalysisResult.verdict,
+        AnalysisResult.summary,
+    ).join(
+        AnalysisResult, Candidate.id == AnalysisResult.candidate_id
+    ).join(
+        Job, Candidate.job_id == Job.id
+    ).where(
+        AnalysisResult.score >= min_score, ai_scored()
+    ).order_by(AnalysisResult.score.desc())
+
+    return [{
+        'id': row.id,
+        'name': row.name,
+        'email': row.email or '',
+        'resume_filename': row.resume_filename,
+        'job_title': row.job_title,
+        'company': row.company,
+        'job_id': row.job_id,
+        'score': row.score,
+        'verdict': row.verdict,
+        'summary': row.summary
+    } for row in db.session.execute(stmt)]
+
+def get_dashboard_summary(min_score):
+    """
+    Aggregates per-job applicant statistics in the database.
+
+    Returns:
+        A (total_jobs, total_applicants, jobs_summary) tuple; AI-scored
+        candidates with a score of at least min_score count as shortlisted.
+        Provisional local scores are only counted as pending AI re-scoring.
+    """
+    shortlisted = db.func.sum(db.case((db.and_(AnalysisResult.score >= min_score, ai_scored()), 1), else_=0))
+    rejected = db.func.sum(db.case((db.and_(AnalysisResult.score < min_score, ai_scored()), 1), else_=0))
+    pending = db.func.sum(db.case((AnalysisResult.source == LOCAL_SOURCE, 1), else_=0))
+    # avg() skips the NULLs produced for local scores
+    avg_score = db.func.avg(db.case((ai_scored(), AnalysisResult.score), else_=None))
+    stmt = db.select(
+        Job.id,
+        Job.title,
+        db.func.count(Candidate.id).label("total_applicants"),
+        shortlisted.label("shortlisted_count"),
+        rejected.label("rejected_count"),
+        pending.label("pending_count"),
+        avg_score.label("avg_score"),
+    ).outerjoin(
+        Candidate, Candidate.job_id == Job.id
+    ).outerjoin(
+        AnalysisResult, Candidate.id == AnalysisResult.candidate_id
+    ).group_by(Job.id).order_by(Job.id.desc())
+
+    jobs_summary = []
+    total_applicants = 0
+    for row in db.session.execute(stmt):
+        total_applicants += row.total_applicants
+        jobs_summary.append({
+            'id': row.id,
+            'title': row.title,
+            'shortlisted_count': row.shortlisted_count or 0,
+            'rejected_count': row.rejected_count or 0,
+            'pending_count': row.pending_count or 0,
+            'total_applicants': row.total_applicants,
+            'avg_score': round(row.avg_score, 1) if row.avg_score is not None else 0
+        })
+    return len(jobs_summary), total_applicants, jobs_summary
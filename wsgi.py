@@ -0,0 +1,8 @@
+# wsgi.py
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+from app import app
+from database import create_tables
+
+# Runs once in the gunicorn master when the app is preloaded, before workers fork
+with app.app_context():
+    create_tables()